@@ -6,11 +6,20 @@ cli-artifacts: Windows Event Log parser for people who hate Event Viewer
 import argparse
 import sys
 import csv
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice, repeat
 from pathlib import Path
 from datetime import datetime
-import xml.etree.ElementTree as ET
 
-from Evtx.Evtx import Evtx
+from evtx import PyEvtxParser
 
 
 # Windows event levels - these are the standard ones
@@ -22,76 +31,379 @@ LEVELS = {
     0: "info",  # 0 is "LogAlways", basically info
 }
 
+# the other way round, for filtering on the raw level number
+LEVEL_NUMS = {name: num for num, name in LEVELS.items() if num}
 
-def parse_event_xml(xml_str):
-    """Pull the useful bits out of the event XML."""
+# padded display names, so format_event doesn't upper()/pad every event
+LEVEL_LABELS = {name: f"{name.upper():<8}" for name in LEVEL_NUMS}
+
+# messages get cut off here
+MAX_MESSAGE = 200
+
+# events buffered up before each write to stdout
+STDOUT_BATCH = 1000
+
+# one of these per parsed record, so keep it lighter than a dict.
+# fields are in CSV column order so an Event can be written as the row itself
+Event = namedtuple("Event", "timestamp level event_id provider message")
+
+# cheap peek at the raw record JSON so filtered-out records never get decoded.
+# EventID turns into an object when it carries a Qualifiers attribute
+_RE_EID = re.compile(r'"EventID":\s*(?:\{\s*"#attributes":\s*\{[^{}]*\},\s*"#text":\s*)?(\d+)')
+_RE_LVL = re.compile(r'"Level":\s*(\d+)')
+
+
+def _text(value):
+    """Plain text of a JSON value from evtx (elements with attributes become dicts)."""
+    if isinstance(value, dict):
+        value = value.get("#text")
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return " | ".join(t for t in map(_text, value) if t)
+    return str(value)
+
+
+def _attr(elem, name):
+    """Attribute of a JSON element, or "unknown"."""
+    if isinstance(elem, dict):
+        return elem.get("#attributes", {}).get(name, "unknown")
+    return "unknown"
+
+
+def _data_values(event_data):
+    """Each non-empty EventData value in order, unnamed Data arrays flattened."""
+    for key, value in event_data.items():
+        if key in ("#attributes", "Binary"):
+            continue
+        if isinstance(value, dict):
+            value = value.get("#text")
+        for item in value if isinstance(value, list) else (value,):
+            text = _text(item)
+            if text:
+                yield text
+
+
+def parse_record(data):
+    """Pull the useful bits out of one record's JSON."""
+    event = json.loads(data).get("Event") or {}
+    system = event.get("System")
+    if system is None:
+        return None
+    
+    event_id = int(_text(system["EventID"])) if "EventID" in system else 0
+    level_num = int(_text(system["Level"])) if "Level" in system else 4
+    
+    # the actual message lives in EventData (named Data turn into keys).
+    # stop collecting once there's enough to fill the truncated message
+    event_data = event.get("EventData") or {}
+    data_items = []
+    size = -3  # no separator in front of the first item
+    if isinstance(event_data, dict):
+        for text in _data_values(event_data):
+            data_items.append(text)
+            size += len(text) + 3
+            if size >= MAX_MESSAGE:
+                break
+    message = " | ".join(data_items)
+    
+    return Event(
+        _attr(system.get("TimeCreated"), "SystemTime"),
+        LEVELS.get(level_num, "info"),
+        event_id,
+        _attr(system.get("Provider"), "Name"),
+        message[:MAX_MESSAGE],  # truncate long messages
+    )
+
+
+def _system_span(data):
+    """Where the System object sits in the raw record JSON, or None without one."""
+    start = data.find('"System":')
+    if start < 0:
+        return None
+    end = data.find('"EventData":', start)
+    if end < 0:
+        end = data.find('"UserData":', start)
+    return start, end if end >= 0 else len(data)
+
+
+def make_filter(event_id=None, level=None, peek_both=False):
+    """Build (peek, keep) to check the --event-id/--level filters on the raw JSON."""
+    # digits are compared as strings, so nothing gets converted to int
+    want_eid = str(event_id) if event_id else None
+    want_level = str(LEVEL_NUMS[level]) if level else None
+    # only run the regexes the filters need, unless the caller wants both
+    need_eid = peek_both or want_eid is not None
+    need_level = peek_both or want_level is not None
+    
+    def peek(data):
+        # only look inside System: a record without one goes to the full parse,
+        # which drops it, so only records that would be counted anyway are rejected
+        span = _system_span(data)
+        if span is None:
+            return None, None
+        eid = _RE_EID.search(data, *span) if need_eid else None
+        lvl = _RE_LVL.search(data, *span) if need_level else None
+        return (eid and eid.group(1)), (lvl and lvl.group(1))
+    
+    def keep(peeked):
+        eid, num = peeked
+        # a field that wasn't found is left to the full parse
+        if peek_both and (eid is None or num is None):
+            return True
+        if want_eid is not None and eid is not None and eid != want_eid:
+            return False
+        if want_level is not None and num is not None:
+            # anything that isn't 1-3 counts as info
+            if num != want_level and not (want_level == "4" and num not in ("1", "2", "3")):
+                return False
+        return True
+    
+    return peek, keep
+
+
+def parse_evtx(filepath, jobs=0, filters=None, summary=False, stop_after=None):
+    """Parse a Windows Event Log file and yield (position, event, peeked).
+    
+    Records rejected by `filters` (from make_filter) come back with event None.
+    """
+    # hand the crate the path rather than a file object (or an mmap): given a
+    # path it reads chunks itself in Rust, a file-like object means a call back
+    # into Python and a copy for every read
+    parser = PyEvtxParser(str(filepath), jobs)
+    # positions count broken records too, so they don't move with the filters
+    for position, record in enumerate(islice(parser.records_json(), stop_after), 1):
+        # broken records come back as the exception instead of raising
+        if isinstance(record, Exception):
+            continue
+        try:
+            data = record["data"]
+            if filters is not None:
+                peek, keep = filters
+                peeked = peek(data)
+                # rejects still count, and carry the peeked digits for the index
+                if not keep(peeked):
+                    yield position, None, peeked
+                    continue
+                # a summary never shows more than the peek already found
+                if summary and None not in peeked:
+                    eid, num = peeked
+                    yield position, Event("", LEVELS.get(int(num), "info"), int(eid), "", ""), None
+                    continue
+            event = parse_record(data)
+            if event:
+                yield position, event, None
+        except Exception:
+            # some records are just broken, skip em
+            continue
+
+
+def index_path(filepath):
+    """Where the sidecar index for a log lives (next to it, .evtxidx)."""
+    return filepath.with_name(filepath.name + ".evtxidx")
+
+
+def load_index(filepath):
+    """Load the sidecar index for a log, or None if missing or stale.
+    
+    It's JSON (not pickle, it sits next to evidence): the log's size/mtime,
+    its record count, and per (event_id, level) the count and last position.
+    """
     try:
-        root = ET.fromstring(xml_str)
-        
-        # namespace bs - Windows events use this everywhere
-        ns = {"ns": "http://schemas.microsoft.com/win/2004/08/events/event"}
-        
-        system = root.find("ns:System", ns)
-        if system is None:
+        with open(index_path(filepath), encoding="utf-8") as f:
+            index = json.load(f)
+        stat = filepath.stat()
+        if index["size"] != stat.st_size or index["mtime_ns"] != stat.st_mtime_ns:
             return None
+        pairs = {(eid, lvl): (n, last) for eid, lvl, n, last in index["pairs"]}
+        return {"count": index["count"], "pairs": pairs}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_index(filepath, stat, count, pairs):
+    """Write the sidecar index; quietly skipped if we can't (e.g. read-only media).
+    
+    `stat` is from before the scan, so a log written to meanwhile goes stale.
+    """
+    # temp file and swap, since workers may share a log
+    path = index_path(filepath)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        index = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "count": count,
+            "pairs": sorted([eid, lvl, n, last] for (eid, lvl), (n, last) in pairs.items()),
+        }
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+def index_matches(index, event_id=None, level=None):
+    """The indexed (event_id, level) pairs that get through these filters."""
+    return {
+        (eid, lvl): info
+        for (eid, lvl), info in index["pairs"].items()
+        if (not event_id or eid == event_id) and (not level or lvl == level)
+    }
+
+
+def format_event(event):
+    """Format a single event in a readable way (no trailing newline)."""
+    line = f"[{event.timestamp}] {LEVEL_LABELS[event.level]} Event {event.event_id} ({event.provider})"
+    if event.message:
+        line += f"\n    {event.message}"
+    return line
+
+
+class EventPrinter:
+    """Prints events to stdout (or `stream`) in batches rather than a print() (and lock) per line."""
+    
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.buf = io.StringIO()
+        self.pending = 0
+    
+    def __call__(self, event):
+        self.buf.write(format_event(event))
+        self.buf.write("\n")
+        self.pending += 1
+        if self.pending == STDOUT_BATCH:
+            self.flush()
+    
+    def flush(self):
+        self.stream.write(self.buf.getvalue())
+        self.buf.seek(0)
+        self.buf.truncate()
+        self.pending = 0
+
+
+def scan_file(filepath, event_id=None, level=None, summary=False, jobs=0, emit=None,
+              use_index=False):
+    """Run one file through the filters, handing each matching event to emit().
+    
+    With summary, only event IDs and levels are read where possible.
+    With use_index, the log's sidecar index is used (or written, if there
+    isn't a current one) to skip reading what can't match.
+    Returns (records read, Counter of levels among the matches).
+    """
+    # LEVELS values are interned constants; interning the filter too means
+    # the per-event level compare is just an identity check
+    if level:
+        level = sys.intern(level)
+    
+    # a previous run left an index, so we may not need to read much (or any)
+    # of the file
+    index = load_index(filepath) if use_index else None
+    stop_after = None
+    if index is not None:
+        matches = index_matches(index, event_id, level)
+        if emit is None:
+            # nothing to print, so the index already has every answer
+            level_counts = Counter()
+            for (_, lvl), (n, _) in matches.items():
+                level_counts[lvl] += n
+            return index["count"], level_counts
         
-        event_id_elem = system.find("ns:EventID", ns)
-        event_id = int(event_id_elem.text) if event_id_elem is not None else 0
+        # nothing past the last matching record can get through
+        stop_after = max((last for _, last in matches.values()), default=0)
+        if not stop_after:
+            return index["count"], Counter()
+    
+    # otherwise note every (event_id, level) we come across so the next run
+    # can use them: {pair: (records, position of the last one)}
+    pairs = {} if use_index and index is None else None
+    stat = filepath.stat() if pairs is not None else None
+    
+    def note(pair, position):
+        n, _ = pairs.get(pair, (0, 0))
+        pairs[pair] = (n + 1, position)
+    
+    # a summary takes event IDs and levels from the peek, so it wants both
+    filters = None
+    if level or event_id or summary:
+        filters = make_filter(event_id, level, peek_both=summary or pairs is not None)
+    
+    count = 0
+    level_counts = Counter()
+    
+    for position, event, peeked in parse_evtx(filepath, jobs, filters, summary, stop_after):
+        count += 1
         
-        level_elem = system.find("ns:Level", ns)
-        level_num = int(level_elem.text) if level_elem is not None else 4
-        level = LEVELS.get(level_num, "info")
+        # already rejected by the cheap peek
+        if event is None:
+            if pairs is not None:
+                note((int(peeked[0]), LEVELS.get(int(peeked[1]), "info")), position)
+            continue
         
-        time_elem = system.find("ns:TimeCreated", ns)
-        timestamp = time_elem.get("SystemTime") if time_elem is not None else "unknown"
+        if pairs is not None:
+            note((event.event_id, event.level), position)
         
-        provider_elem = system.find("ns:Provider", ns)
-        provider = provider_elem.get("Name") if provider_elem is not None else "unknown"
+        # filter by level if specified
+        if level and event.level != level:
+            continue
         
-        # try to get the actual message from EventData
-        event_data = root.find("ns:EventData", ns)
-        message = ""
-        if event_data is not None:
-            data_items = event_data.findall("ns:Data", ns)
-            message = " | ".join([d.text for d in data_items if d.text])
+        # filter by event ID if specified
+        if event_id and event.event_id != event_id:
+            continue
         
-        return {
-            "event_id": event_id,
-            "level": level,
-            "timestamp": timestamp,
-            "provider": provider,
-            "message": message[:200] if message else ""  # truncate long messages
-        }
-    except ET.ParseError:
-        return None
+        level_counts[event.level] += 1
+        if emit is not None:
+            emit(event)
+    
+    if pairs is not None:
+        save_index(filepath, stat, count, pairs)
+    elif stop_after is not None:
+        # stopped early, the index knows how many records there are
+        count = index["count"]
+    
+    return count, level_counts
 
 
-def parse_evtx(filepath):
-    """Parse a Windows Event Log file and yield events."""
-    with Evtx(str(filepath)) as log:
-        for record in log.records():
-            try:
-                event = parse_event_xml(record.xml())
-                if event:
-                    yield event
-            except Exception:
-                # some records are just broken, skip em
-                continue
+def scan_file_worker(filepath, event_id, level, summary, fmt, use_index):
+    """scan_file for a worker process; matches ("csv" or "text") go to a temp file whose path comes back."""
+    # the pool already has a process per core, so one decode thread each
+    if fmt is None:
+        return (*scan_file(filepath, event_id, level, summary, 1, None, use_index), None)
+    
+    # spool to disk so a big log never sits in memory or gets pickled back whole
+    tmp = tempfile.NamedTemporaryFile("w", newline="", encoding="utf-8",
+                                      suffix=".part", delete=False)
+    try:
+        with tmp:
+            emit = csv.writer(tmp).writerow if fmt == "csv" else EventPrinter(tmp)
+            count, level_counts = scan_file(filepath, event_id, level, summary, 1, emit, use_index)
+            if isinstance(emit, EventPrinter):
+                emit.flush()
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    return count, level_counts, tmp.name
 
 
-def print_event(event):
-    """Print a single event in a readable format."""
-    level_display = event["level"].upper().ljust(8)
-    print(f"[{event['timestamp']}] {level_display} Event {event['event_id']} ({event['provider']})")
-    if event["message"]:
-        print(f"    {event['message']}")
+def non_negative_int(value):
+    """argparse type for counts where 0 means "pick for me"."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {number}")
+    return number
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="Parse Windows Event Logs without the GUI nightmare"
     )
-    parser.add_argument("logfile", type=Path, help="Path to .evtx file")
+    parser.add_argument("logfiles", nargs="+", type=Path, metavar="logfile", help="Path(s) to .evtx files")
     parser.add_argument(
         "-e", "--event-id", 
         type=int, 
@@ -112,55 +424,82 @@ def main():
         action="store_true",
         help="Show summary stats only (no individual events)"
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=non_negative_int,
+        default=0,
+        help="Decode threads for one file, or worker processes for several (default: one per core)"
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Keep a <logfile>.evtxidx next to each log to speed up repeat runs"
+    )
     
     args = parser.parse_args()
     
-    if not args.logfile.exists():
-        print(f"Error: {args.logfile} not found", file=sys.stderr)
-        sys.exit(1)
-    
-    if not str(args.logfile).lower().endswith(".evtx"):
-        print(f"Warning: {args.logfile} doesn't look like an .evtx file", file=sys.stderr)
+    for logfile in args.logfiles:
+        if not logfile.exists():
+            print(f"Error: {logfile} not found", file=sys.stderr)
+            sys.exit(1)
+        
+        if not str(logfile).lower().endswith(".evtx"):
+            print(f"Warning: {logfile} doesn't look like an .evtx file", file=sys.stderr)
     
-    count = 0
-    shown = 0
-    filtered_events = []
+    # a summary on its own only needs event IDs and levels
+    summary = args.summary and not args.output
     
-    for event in parse_evtx(args.logfile):
-        count += 1
+    # write each event out as soon as it passes the filters, nothing is kept
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else nullcontext()
+    with out as f:
+        emit = None
+        if args.output:
+            writer = csv.writer(f)
+            writer.writerow(Event._fields)
+            emit = writer.writerow
+        elif not args.summary:
+            emit = EventPrinter()
         
-        # filter by level if specified
-        if args.level and event["level"] != args.level:
-            continue
+        if len(args.logfiles) == 1:
+            count, level_counts = scan_file(args.logfiles[0], args.event_id, args.level,
+                                            summary, args.jobs, emit, args.index)
+        else:
+            # files are independent, so parse them side by side and copy
+            # each one's spooled matches out (in the order given) as it comes back
+            fmt = None
+            if args.output:
+                fmt, dest = "csv", f
+            elif not args.summary:
+                fmt, dest = "text", sys.stdout
+            count = 0
+            level_counts = Counter()
+            with ProcessPoolExecutor(max_workers=args.jobs or None) as pool:
+                results = pool.map(
+                    scan_file_worker,
+                    args.logfiles,
+                    repeat(args.event_id),
+                    repeat(args.level),
+                    repeat(summary),
+                    repeat(fmt),
+                    repeat(args.index),
+                )
+                for file_count, file_levels, spooled in results:
+                    count += file_count
+                    level_counts.update(file_levels)
+                    if spooled is not None:
+                        try:
+                            with open(spooled, newline="", encoding="utf-8") as part:
+                                shutil.copyfileobj(part, dest)
+                        finally:
+                            os.unlink(spooled)
         
-        # filter by event ID if specified
-        if args.event_id and event["event_id"] != args.event_id:
-            continue
-        
-        filtered_events.append(event)
-        shown += 1
+        if isinstance(emit, EventPrinter):
+            emit.flush()
+    
+    shown = sum(level_counts.values())
     
-    # output results
     if args.output:
-        # CSV export
-        with open(args.output, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["timestamp", "level", "event_id", "provider", "message"])
-            writer.writeheader()
-            writer.writerows(filtered_events)
         print(f"Exported {shown} events to {args.output}")
-    elif args.summary:
-        # just show summary stats
-        pass
-    else:
-        # print to stdout
-        for event in filtered_events:
-            print_event(event)
-    
-    # always show summary at the end
-    level_counts = {}
-    for event in filtered_events:
-        lvl = event["level"]
-        level_counts[lvl] = level_counts.get(lvl, 0) + 1
     
     # print summary
     filters = []
@@ -171,7 +510,7 @@ def main():
     
     print()
     if level_counts:
-        breakdown = ", ".join([f"{lvl}: {c}" for lvl, c in sorted(level_counts.items())])
+        breakdown = ", ".join(f"{lvl}: {c}" for lvl, c in sorted(level_counts.items()))
         print(f"Breakdown: {breakdown}")
     
     if filters:
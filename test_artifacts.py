@@ -0,0 +1,342 @@
+"""
+Tests for the filter/index plumbing, with the evtx parser stubbed out.
+
+Run with: python -m unittest
+"""
+
+import functools
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+import artifacts
+
+
+def record(event_id, level, message="", qualifiers=False):
+    """A records_json() item shaped like the evtx crate's output."""
+    eid = {"#attributes": {"Qualifiers": 16384}, "#text": event_id} if qualifiers else event_id
+    event = {
+        "Event": {
+            "System": {
+                "Provider": {"#attributes": {"Name": "Service Control Manager"}},
+                "EventID": eid,
+                "Level": level,
+                "TimeCreated": {"#attributes": {"SystemTime": "2012-03-14T04:17:43.354563Z"}},
+            },
+            "EventData": {"param1": message} if message else None,
+        }
+    }
+    return {"event_record_id": 1, "timestamp": "", "data": json.dumps(event, indent=2)}
+
+
+RECORDS = [
+    record(7036, 4, "Windows Update | running", qualifiers=True),
+    record(4624, 0, "logon"),
+    RuntimeError("broken record"),
+    record(1000, 2, "app crash"),
+    record(41, 1),
+    record(7036, 3, "stopped"),
+]
+
+ARG_SETS = [
+    [],
+    ["-s"],
+    ["-e", "7036"],
+    ["-l", "info"],
+    ["-e", "7036", "-l", "warning"],
+    ["-e", "41", "-l", "info"],
+    ["-s", "-l", "critical"],
+]
+
+
+class FakeParser:
+    """Stands in for evtx.PyEvtxParser, serving `records` and counting opens."""
+
+    records = RECORDS
+    opened = 0
+
+    def __init__(self, path, threads=0):
+        FakeParser.opened += 1
+
+    def records_json(self):
+        return iter(self.records)
+
+
+class LogTestCase(unittest.TestCase):
+    """Runs the CLI against one stubbed log in a temp dir."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.log = self.dir / "System.evtx"
+        self.log.write_bytes(b"ElfFile\0")
+
+        FakeParser.records = RECORDS
+        FakeParser.opened = 0
+        patcher = mock.patch.object(artifacts, "PyEvtxParser", FakeParser)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_cli(self, *args):
+        """Run main() and return what it printed (plus the CSV, if one was written)."""
+        out = io.StringIO()
+        with mock.patch.object(sys, "argv", ["artifacts.py", str(self.log), *args]), \
+                redirect_stdout(out):
+            artifacts.main()
+        text = out.getvalue()
+        if "-o" in args:
+            text += Path(args[args.index("-o") + 1]).read_text(encoding="utf-8")
+        return text
+
+
+class IndexTests(LogTestCase):
+
+    def test_no_index_written_by_default(self):
+        self.run_cli()
+        self.assertFalse(artifacts.index_path(self.log).exists())
+
+    def test_fresh_indexed_and_stale_runs_agree(self):
+        csv_path = str(self.dir / "out.csv")
+        for args in ARG_SETS + [["-o", csv_path], ["-o", csv_path, "-e", "7036"]]:
+            with self.subTest(args=args):
+                artifacts.index_path(self.log).unlink(missing_ok=True)
+                expected = self.run_cli(*args)
+
+                self.assertEqual(self.run_cli("--index", *args), expected)  # builds it
+                self.assertTrue(artifacts.index_path(self.log).exists())
+                self.assertEqual(self.run_cli("--index", *args), expected)  # uses it
+
+                # a log that changed since makes the index stale
+                os.utime(self.log, ns=(0, 0))
+                self.assertEqual(self.run_cli("--index", *args), expected)
+
+    def test_filtered_run_builds_complete_index(self):
+        self.run_cli("--index", "-e", "41")
+        from_filtered = artifacts.load_index(self.log)
+        artifacts.index_path(self.log).unlink()
+        self.run_cli("--index")
+        self.assertEqual(artifacts.load_index(self.log), from_filtered)
+
+    def test_index_answers_summary_without_parsing(self):
+        self.run_cli("--index")
+        FakeParser.opened = 0
+        output = self.run_cli("--index", "-s", "-l", "info")
+        self.assertEqual(FakeParser.opened, 0)
+        self.assertIn("Total: 2 of 5 events (level=info)", output)
+
+    def test_index_skips_log_that_cannot_match(self):
+        self.run_cli("--index")
+        FakeParser.opened = 0
+        output = self.run_cli("--index", "-e", "41", "-l", "info")
+        self.assertEqual(FakeParser.opened, 0)
+        self.assertIn("Total: 0 of 5 events", output)
+
+    def test_index_stops_after_last_match(self):
+        self.run_cli("--index")
+
+        def records_json(parser):
+            for position, item in enumerate(RECORDS, 1):
+                if position > 2:
+                    raise AssertionError("read past the last 4624")
+                yield item
+
+        with mock.patch.object(FakeParser, "records_json", records_json):
+            output = self.run_cli("--index", "-e", "4624")
+        self.assertIn("Event 4624", output)
+        self.assertIn("Total: 1 of 5 events (event_id=4624)", output)
+
+    def test_grown_log_is_reread(self):
+        self.run_cli("--index")
+
+        FakeParser.records = RECORDS + [record(41, 1)]
+        with self.log.open("ab") as f:
+            f.write(b"more chunks")
+
+        output = self.run_cli("--index", "-e", "41")
+        self.assertIn("Breakdown: critical: 2", output)
+        self.assertIn("Total: 2 of 6 events (event_id=41)", output)
+        output = self.run_cli("--index", "-s")
+        self.assertIn("Total: 6 events", output)
+
+    def test_log_written_during_scan_leaves_stale_index(self):
+        grown = RECORDS + [record(41, 1)]
+
+        def records_json(parser):
+            for position, item in enumerate(RECORDS, 1):
+                if position == 3:
+                    with self.log.open("ab") as f:
+                        f.write(b"more chunks")
+                yield item
+
+        with mock.patch.object(FakeParser, "records_json", records_json):
+            self.run_cli("--index")
+        self.assertIsNone(artifacts.load_index(self.log))
+
+        FakeParser.records = grown
+        self.assertIn("Total: 6 events", self.run_cli("--index", "-s"))
+
+
+class ScanTests(LogTestCase):
+
+    def test_records_without_system_count_the_same_whatever_the_filter(self):
+        no_system = json.dumps({"Event": {"EventData": {"EventID": 5, "Level": 2}}})
+        FakeParser.records = [{"event_record_id": 1, "timestamp": "", "data": no_system}]
+        for event_id in ("5", "6"):
+            with self.subTest(event_id=event_id):
+                artifacts.index_path(self.log).unlink(missing_ok=True)
+                output = self.run_cli("--index", "-e", event_id)
+                self.assertIn(f"Total: 0 of 0 events (event_id={event_id})", output)
+                self.assertEqual(artifacts.load_index(self.log)["count"], 0)
+
+    def test_summary_agrees_with_full_run_on_records_without_system(self):
+        no_system = json.dumps({"Event": {"EventData": {"EventID": 5, "Level": 2}}})
+        FakeParser.records = RECORDS + [{"event_record_id": 1, "timestamp": "", "data": no_system}]
+        full = self.run_cli()
+        summary = self.run_cli("-s")
+        self.assertIn("Total: 5 events", summary)
+        self.assertEqual(summary, full[full.index("\nBreakdown"):])
+
+    def test_filtered_summary_peeks_each_record_once(self):
+        searches = []
+        for name in ("_RE_EID", "_RE_LVL"):
+            pattern = getattr(artifacts, name)
+            regex = mock.Mock(search=lambda *a, p=pattern: searches.append(1) or p.search(*a))
+            patcher = mock.patch.object(artifacts, name, regex)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.run_cli("-s", "-e", "7036")
+        self.assertEqual(len(searches), 2 * 5)
+
+    def test_csv_header_and_first_row(self):
+        csv_path = self.dir / "out.csv"
+        self.run_cli("-o", str(csv_path))
+        rows = csv_path.read_text(encoding="utf-8").splitlines()
+        self.assertEqual(rows[:2], [
+            "timestamp,level,event_id,provider,message",
+            "2012-03-14T04:17:43.354563Z,info,7036,Service Control Manager,Windows Update | running",
+        ])
+        self.assertEqual(len(rows), 1 + 5)
+
+    def test_long_message_cut_to_max_message(self):
+        FakeParser.records = [record(1000, 2, "x" * 5000)]
+        output = self.run_cli("-e", "1000")
+        self.assertIn("\n    " + "x" * artifacts.MAX_MESSAGE + "\n", output)
+        self.assertNotIn("x" * (artifacts.MAX_MESSAGE + 1), output)
+
+    def test_more_events_than_one_stdout_batch(self):
+        total = artifacts.STDOUT_BATCH * 2 + 500
+        FakeParser.records = [record(4624, 0, f"logon {n}") for n in range(total)]
+        lines = self.run_cli().splitlines()
+        messages = [line.strip() for line in lines if line.startswith("    logon ")]
+        self.assertEqual(messages, [f"logon {n}" for n in range(total)])
+        self.assertIn(f"Total: {total} events", lines)
+
+
+class PerLogParser(FakeParser):
+    """FakeParser serving a record with the log's name in it, so output order shows."""
+
+    def __init__(self, path, threads=0):
+        self.name = Path(path).stem
+
+    def records_json(self):
+        return iter([record(41, 1), record(7036, 4, self.name)])
+
+
+@unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "needs fork")
+class CliTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.logs = []
+        for name in ("first", "second", "third"):
+            log = self.dir / f"{name}.evtx"
+            log.write_bytes(b"ElfFile\0")
+            self.logs.append(str(log))
+
+        # forked workers inherit the stubbed parser
+        fork_pool = functools.partial(artifacts.ProcessPoolExecutor,
+                                      mp_context=multiprocessing.get_context("fork"))
+        for patcher in (mock.patch.object(artifacts, "PyEvtxParser", PerLogParser),
+                        mock.patch.object(artifacts, "ProcessPoolExecutor", fork_pool)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_cli(self, *args):
+        out = io.StringIO()
+        with mock.patch.object(sys, "argv", ["artifacts.py", *self.logs, "-j", "2", *args]), \
+                redirect_stdout(out):
+            artifacts.main()
+        return out.getvalue()
+
+    def test_several_logs_print_in_order(self):
+        lines = self.run_cli("-e", "7036").splitlines()
+        self.assertEqual([line.strip() for line in lines[1:6:2]], ["first", "second", "third"])
+        self.assertIn("Total: 3 of 6 events (event_id=7036)", lines)
+        self.assertIn("Breakdown: critical: 3, info: 3", self.run_cli())
+
+    def test_several_logs_export_in_order(self):
+        csv_path = self.dir / "out.csv"
+        output = self.run_cli("-o", str(csv_path), "-l", "info")
+        self.assertIn("Exported 3 events", output)
+        rows = csv_path.read_text(encoding="utf-8").splitlines()
+        self.assertEqual(rows[0], "timestamp,level,event_id,provider,message")
+        self.assertEqual([row.rsplit(",", 1)[-1] for row in rows[1:]], ["first", "second", "third"])
+
+    def test_spooled_matches_are_cleaned_up(self):
+        with mock.patch.object(tempfile, "tempdir", str(self.dir)):
+            self.run_cli()
+        self.assertEqual(sorted(self.dir.glob("*.part")), [])
+
+    def test_negative_jobs_rejected(self):
+        with mock.patch.object(sys, "argv", ["artifacts.py", "x.evtx", "-j", "-1"]), \
+                redirect_stdout(io.StringIO()), mock.patch.object(sys, "stderr", io.StringIO()):
+            with self.assertRaises(SystemExit):
+                artifacts.main()
+
+
+class ParseRecordTests(unittest.TestCase):
+
+    def test_unnamed_data_array_stops_at_max_message(self):
+        values = [f"{i:050d}" for i in range(20000)]
+        data = json.dumps({"Event": {
+            "System": {"EventID": 1, "Level": 4},
+            "EventData": {"Data": {"#text": values}},
+        }})
+        with mock.patch.object(artifacts, "_text", wraps=artifacts._text) as text:
+            event = artifacts.parse_record(data)
+        self.assertEqual(event.message, " | ".join(values)[:artifacts.MAX_MESSAGE])
+        self.assertLess(text.call_count, 20)
+
+
+class FilterTests(unittest.TestCase):
+
+    def test_info_takes_everything_outside_1_to_3(self):
+        peek, keep = artifacts.make_filter(level="info")
+        for level_num, expected in [(0, True), (1, False), (2, False), (3, False), (4, True), (5, True)]:
+            with self.subTest(level_num=level_num):
+                data = record(1, level_num)["data"]
+                self.assertEqual(keep(peek(data)), expected)
+
+    def test_event_id_with_qualifiers(self):
+        peek, keep = artifacts.make_filter(event_id=7036)
+        self.assertTrue(keep(peek(record(7036, 4, qualifiers=True)["data"])))
+        self.assertFalse(keep(peek(record(70360, 4)["data"])))
+
+    def test_missing_fields_are_left_to_full_parse(self):
+        peek, keep = artifacts.make_filter(event_id=7036, level="error")
+        self.assertTrue(keep(peek("{}")))
+
+
+
+if __name__ == "__main__":
+    unittest.main()